@@ -0,0 +1,237 @@
+"""
+The House in the Woods
+Transcript analyzer
+
+Mines the opt-in transcripts written by the game (see TRANSCRIPT in main.py) for words the parser
+didn't understand. Log files are cut into chunks scanned by a process pool, each chunk is summarized
+in a fixed number of counters, so memory use doesn't grow with the size of the logs.
+
+Run it in the game's directory:
+    python analyze.py turns.log [more.log ...] [--top 10] [--workers 4]
+"""
+
+import argparse  # command line arguments
+import difflib  # finding similar known words
+import json  # transcript records
+import os  # file sizes
+from multiprocessing import Pool  # scanning chunks in parallel
+
+import main as game  # game data and its loading
+
+
+####################################################################################################
+# CONSTANTS
+####################################################################################################
+
+CHUNK_SIZE = 64 * 1024 * 1024  # bytes of log scanned by a worker at once
+SUMMARY_SIZE = 10000  # counters kept in a summary, see summarize()
+MISSES = {"???", "unknown", "specify"}  # outcomes of turns the parser didn't understand
+SIMILARITY = 0.6  # cutoff for suggesting a known word as synonym
+ELEMENTS = ("commands", "direction", "items", "rooms", "misc")  # vocabularies of the parser
+
+KNOWN = set()  # all known words, set in every worker by init()
+
+
+####################################################################################################
+# MAIN EXECUTING FUNCTION
+####################################################################################################
+
+def main():
+    """Main executing function.
+
+    Args:   none
+
+    Modifies:   nothing
+
+    Returns:    nothing
+    """
+    parser = argparse.ArgumentParser(description="Mine transcripts for unrecognised words.")
+    parser.add_argument("logs", nargs="+", help="transcript files")
+    parser.add_argument("--top", type=int, default=10, help="words to show per room")
+    parser.add_argument("--workers", type=int, default=None, help="number of processes")
+    args = parser.parse_args()
+
+    adv = game.setup(*game.get_jsons())
+    owners = words(adv)
+    summary = {}
+    with Pool(args.workers, initializer=init, initargs=(set(owners),)) as pool:
+        for counts in pool.imap_unordered(scan, chunks(args.logs), chunksize=1):
+            summary = merge(summary, counts)
+
+    for room, tokens in report(summary, args.top).items():
+        print(room.capitalize() + ":")
+        for token, count in tokens:
+            print("    {:<24}{:>10}    {}".format(token, count, suggest(token, owners)))
+
+
+####################################################################################################
+# WORKER FUNCTIONS
+# Functions here run in the worker processes.
+####################################################################################################
+
+def init(known):
+    """Pool initializer, hand over the known words to the worker once.
+
+    Args:
+        known:  set of all known words
+
+    Modifies:
+        KNOWN:  gets the known words
+
+    Returns:    nothing
+    """
+    KNOWN.update(known)
+
+def scan(chunk):
+    """Count unrecognised words per room in a chunk of a transcript.
+    A line belongs to the chunk it starts in, so partial lines at the edges are left to the
+    neighbouring chunks.
+
+    Args:
+        chunk:  tuple of filename, first and last byte position
+
+    Modifies:   nothing
+
+    Returns:
+        dict:   summary with (room, word) keys and counts as values
+    """
+    filename, start, end = chunk
+    counts = {}
+    with open(filename, "rb") as fo:
+        if start:
+            fo.seek(start - 1)
+            fo.readline()
+        while fo.tell() < end:
+            line = fo.readline()
+            if not line:
+                break
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if record.get("outcome") in MISSES:
+                for token in record["tokens"]:
+                    if token not in KNOWN:
+                        key = (record["location"], token)
+                        counts[key] = counts.get(key, 0) + 1
+                        if len(counts) > 2 * SUMMARY_SIZE:  # amortize summarizing
+                            counts = summarize(counts)
+    return counts
+
+
+####################################################################################################
+# HELPER FUNCTIONS
+####################################################################################################
+
+def chunks(filenames):
+    """Cut transcript files into chunks.
+
+    Args:
+        filenames:  list of transcript filenames
+
+    Modifies:   nothing
+
+    Yields:
+        tuple:  filename, first and last byte position of the chunk
+    """
+    for filename in filenames:
+        size = os.path.getsize(filename)
+        for start in range(0, size, CHUNK_SIZE):
+            yield filename, start, min(start + CHUNK_SIZE, size)
+
+def summarize(counts):
+    """Keep the most frequent counters only (Misra-Gries summary).
+    Every counter is decreased by the count of the first one falling out, so the summary stays an
+    underestimate and summaries of chunks can be merged safely.
+
+    Args:
+        counts: dictionary of keys and counts
+
+    Modifies:   nothing
+
+    Returns:
+        dict:   at most SUMMARY_SIZE keys and decreased counts
+    """
+    if len(counts) <= SUMMARY_SIZE:
+        return counts
+    cut = sorted(counts.values(), reverse=True)[SUMMARY_SIZE]
+    return {key: count - cut for key, count in counts.items() if count > cut}
+
+def merge(summary, counts):
+    """Merge two summaries.
+
+    Args:
+        summary:    dictionary of keys and counts
+        counts:     dictionary of keys and counts
+
+    Modifies:   nothing
+
+    Returns:
+        dict:   merged summary
+    """
+    merged = dict(summary)
+    for key, count in counts.items():
+        merged[key] = merged.get(key, 0) + count
+    return summarize(merged)
+
+def report(summary, top):
+    """Most frequent unrecognised words per room.
+
+    Args:
+        summary:    dictionary of (room, word) keys and counts
+        top:        number of words per room
+
+    Modifies:   nothing
+
+    Returns:
+        dict:   rooms with lists of (word, count) tuples, most frequent first
+    """
+    rooms = {}
+    for (room, token), count in summary.items():
+        rooms.setdefault(room, []).append((token, count))
+    return {room: sorted(tokens, key=lambda tc: (-tc[1], tc[0]))[:top]
+            for room, tokens in sorted(rooms.items())}
+
+def words(adv):
+    """Collect every known word of the parser.
+
+    Args:
+        adv:    namedtuple holding the game data
+
+    Modifies:   nothing
+
+    Returns:
+        dict:   known words with the (element, keyword) they belong to
+    """
+    owners = {}
+    for element in ELEMENTS:
+        for keyword, props in getattr(adv, element).items():
+            synonyms = props["words"] if isinstance(props, dict) else props
+            for word in synonyms:
+                owners[word] = (element, keyword)
+    for keyword, item in adv.items.items():
+        for word in item["marker"]:
+            owners.setdefault(word, ("items", keyword))
+    return owners
+
+def suggest(token, owners):
+    """Suggest where an unrecognised word could be added as a synonym.
+
+    Args:
+        token:  unrecognised word
+        owners: dictionary of known words and the (element, keyword) they belong to
+
+    Modifies:   nothing
+
+    Returns:
+        string: suggestion like 'items.json: lábtörlő (lábtörlőt)' or empty
+    """
+    similar = difflib.get_close_matches(token, owners, n=1, cutoff=SIMILARITY)
+    if similar:
+        element, keyword = owners[similar[0]]
+        return "{}.json: {} ({})".format(element, keyword, similar[0])
+    return ""
+
+
+if __name__ == "__main__":
+    main()
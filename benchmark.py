@@ -0,0 +1,196 @@
+"""
+The House in the Woods
+Benchmarks
+
+Timing checks of the parts of the game which must stay fast with large data files.
+
+Run it in the game's directory:
+    python benchmark.py completion [--items 50000] [--rooms 5000]
+    python benchmark.py world [--players 300] [--turns 30]
+"""
+
+import argparse  # command line arguments
+import random  # generating words and commands
+import socket  # connecting players to the shared world
+import sys  # exit status
+import threading  # server and players of the shared world
+import time  # timing
+
+import main as game  # game data and handlers
+import world  # shared world
+
+
+####################################################################################################
+# CONSTANTS
+####################################################################################################
+
+LETTERS = "aábcdeéfghiíjklmnoóöőprstuúüűvz"
+WORD_LENGTH = 10
+REPEAT = 1000  # timed calls per case
+COMPLETION_BUDGET = 0.001  # seconds a tab completion may take
+PREFIXES = ("", "a", "ab", "abc", "lé", "ház")
+WANDER = ("é", "d", "k", "ny", "fel", "le", "nézd", "leltár")  # commands of players in the world
+PROMPTS = (b"? ", b"> ")  # end of a turn's output
+
+
+####################################################################################################
+# MAIN EXECUTING FUNCTION
+####################################################################################################
+
+def main():
+    """Main executing function.
+
+    Args:   none
+
+    Modifies:   nothing
+
+    Returns:    nothing
+    """
+    parser = argparse.ArgumentParser(description="Timing checks of the game.")
+    commands = parser.add_subparsers(dest="benchmark", required=True)
+    completion_ = commands.add_parser("completion", help="tab completion with a large vocabulary")
+    completion_.add_argument("--items", type=int, default=50000, help="extra items")
+    completion_.add_argument("--rooms", type=int, default=5000, help="extra rooms")
+    world_ = commands.add_parser("world", help="players wandering in a shared world")
+    world_.add_argument("--players", type=int, default=300, help="players connected at once")
+    world_.add_argument("--turns", type=int, default=30, help="turns of every player")
+    args = parser.parse_args()
+
+    if args.benchmark == "completion":
+        ok = completion(args.items, args.rooms)
+    elif args.benchmark == "world":
+        ok = shared_world(args.players, args.turns)
+    sys.exit(0 if ok else 1)
+
+
+####################################################################################################
+# BENCHMARKS
+####################################################################################################
+
+def completion(items, rooms):
+    """Time tab completion with extra items and rooms, all of the rooms visited.
+
+    Args:
+        items:  number of extra items
+        rooms:  number of extra rooms
+
+    Modifies:   nothing
+
+    Returns:
+        boolean:    indicates every case fit in COMPLETION_BUDGET
+    """
+    adv = game.setup(*game.get_jsons())
+    game.prepare(adv)
+    names = list(adv.rooms)
+    for idx in range(rooms):
+        name = "room{}".format(idx)
+        adv.rooms[name] = {"long": "", "status": {"visible"}, "words": {word() for _ in range(3)},
+                           "exits": {"n": random.choice(names)}}
+        names.append(name)
+    for idx in range(items):
+        adv.items["item{}".format(idx)] = {"long": "", "marker": set(),
+                                          "status": {"visible", "portable"},
+                                          "words": {word() for _ in range(3)},
+                                          "location": random.choice(names)}
+    adv.player["visited"].update(names)
+    game.stock(adv)
+    complete = game.completer(adv, game.make_index(adv))
+    complete("", 0)  # merge the visited rooms
+
+    ok = True
+    for prefix in PREFIXES:
+        start = time.perf_counter()
+        for _ in range(REPEAT):
+            complete(prefix, 0)
+        elapsed = (time.perf_counter() - start) / REPEAT
+        ok = ok and elapsed < COMPLETION_BUDGET
+        print("{:<8}{:>10.3f} ms".format(repr(prefix), elapsed * 1000))
+    return ok
+
+def shared_world(players, turns):
+    """Time turns of players wandering in a shared world at once.
+    Server and players run in this process, the players' threads compete for the interpreter
+    with the server's ones, so latencies are upper estimates.
+
+    Args:
+        players:    number of players connected at once
+        turns:      number of turns of every player
+
+    Modifies:   nothing
+
+    Returns:
+        boolean:    always True, there's no budget to keep
+    """
+    sys.stdout = world.Output(sys.stdout)
+    server = world.Server(("localhost", 0), world.World())
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    latencies = []
+    wanderers = [threading.Thread(target=wander, args=(server.server_address, "p{}".format(idx),
+                                                       turns, latencies))
+                 for idx in range(players)]
+    start = time.perf_counter()
+    for wanderer in wanderers:
+        wanderer.start()
+    for wanderer in wanderers:
+        wanderer.join()
+    elapsed = time.perf_counter() - start
+    server.shutdown()
+    sys.stdout = sys.__stdout__
+
+    latencies.sort()
+    print("{} players, {} turns in {:.1f} s".format(players, len(latencies), elapsed))
+    for percentile in (50, 90, 99):
+        latency = latencies[min(len(latencies) * percentile // 100, len(latencies) - 1)]
+        print("p{:<4}{:>10.1f} ms".format(percentile, latency * 1000))
+    return True
+
+
+####################################################################################################
+# HELPER FUNCTIONS
+####################################################################################################
+
+def word():
+    """Random word.
+
+    Args:   none
+
+    Modifies:   nothing
+
+    Returns:
+        string: WORD_LENGTH letters
+    """
+    return "".join(random.choices(LETTERS, k=WORD_LENGTH))
+
+def wander(address, name, turns, latencies):
+    """A player wandering in the shared world, timing every turn.
+
+    Args:
+        address:    tuple of the server's host and port
+        name:       player's name
+        turns:      number of turns
+        latencies:  list to append the seconds of every turn to
+
+    Modifies:
+        latencies:  gets the turns' latencies
+
+    Returns:    nothing
+    """
+    with socket.create_connection(address) as connection:
+        def send(line):
+            connection.sendall((line + "\n").encode("utf-8"))
+            received = b""
+            while not any(prompt in received for prompt in PROMPTS):
+                data = connection.recv(65536)
+                if not data:
+                    return
+                received += data
+        send(name)
+        for _ in range(turns):
+            start = time.perf_counter()
+            send(random.choice(WANDER))
+            latencies.append(time.perf_counter() - start)
+        connection.sendall("vége\n".encode("utf-8"))
+
+
+if __name__ == "__main__":
+    main()
@@ -4,12 +4,16 @@ Text adventure game
 """
 
 import json  # data persistence in the game
+import bisect  # searching sorted word lists on tab completion
+import heapq  # pending timed events ordered by due step
 import re  # splitting commands at expletive words
 from collections import namedtuple  # holds all game data
 import textwrap  # pretty printing on console
-import readline  # input() remembers previous entries
+import readline  # input() remembers previous entries, tab completion
+from itertools import islice  # limiting tab completion
 import sys  # exiting
 import os  # file handling
+import time  # measuring turn latency for the transcript
 
 
 ####################################################################################################
@@ -19,7 +23,9 @@ import os  # file handling
 EXPLET = r"\s*(?:\b\s+\b|\baz?\b|\bés\b|\begy\b|\bplusz\b|\bmeg\b)\s*"
 WRAP_WIDTH = 80
 HISTORY_BUFFER = 20
+COMPLETION_LIMIT = 50  # offer at most this many words on tab completion
 CHANGE_PROMPT = 5  # change to simple prompt after 5 steps
+TRANSCRIPT = "THITW_TRANSCRIPT"  # environment variable naming the opt-in transcript file
 SEPARATOR = "________________________________________________________________________________"
 
 RE_EXPLET = re.compile(EXPLET, flags=re.IGNORECASE)
@@ -37,7 +43,8 @@ class Relocate:
         """Class initializer.
 
         Args:
-            location:   string: relocate player to this location
+            location:   string: relocate player to this location or
+                        function:   taking the adventure namedtuple, returning the location
         """
         self._location = location
 
@@ -64,7 +71,8 @@ class Relocate:
                 string: empty string to conform other decorators
             """
             backup_location = adv.player["location"]
-            adv.player["location"] = self._location
+            location = self._location
+            adv.player["location"] = location(adv) if callable(location) else location
             func(adv)
             adv.player["location"] = backup_location
             return ""
@@ -179,21 +187,36 @@ def main():
     if not all(adv):
         sys.exit("Something went wrong, unable to start the game.")
 
-    # create references to handler functions
-    adv.player["commands"] = {command: eval(command) for command in adv.commands}
+    # contents of the rooms, handler references, timed events, etc.
+    stock(adv)
+    prepare(adv)
+
+    # opt-in transcript of every turn, see transcript()
+    if os.environ.get(TRANSCRIPT):
+        adv.player["transcript"] = open(os.environ[TRANSCRIPT], "a", buffering=1, encoding="utf-8")
 
     # setup readline history
     readline.set_history_length(HISTORY_BUFFER)
     readline.clear_history()
     readline.set_auto_history(True)
 
+    # setup readline tab completion over all known words
+    readline.set_completer(completer(adv, make_index(adv)))
+    readline.set_completer_delims(" ")
+    readline.parse_and_bind("tab: complete")
+
     # main game loop
-    while check(adv.player["status"], "playing", "alive", "nowinner", logic=all):
-        room_description(adv)
-        items_listing(adv)
-        adv.rooms[adv.player["location"]]["status"].add("visited")
-        player_input(adv)
-        predefined_events(adv)
+    try:
+        while check(adv.player["status"], "playing", "alive", "nowinner", logic=all):
+            room_description(adv)
+            items_listing(adv)
+            adv.player["visited"].add(adv.player["location"])
+            player_input(adv)
+            predefined_events(adv)
+            timed_events(adv)
+    finally:
+        if adv.player["transcript"]:
+            adv.player["transcript"].close()
 
 
 ####################################################################################################
@@ -201,6 +224,76 @@ def main():
 # All functions here have the single namedtuple argument that holds all the game's data.
 ####################################################################################################
 
+def prepare(adv):
+    """Prepare player's runtime data before the first turn.
+    Used by the shared world too, see world.py.
+
+    Args:
+        adv:    namedtuble holding the game data
+
+    Modifies:
+        adv:    player's handler references, turn notes, transcript and timed events
+
+    Returns:    nothing
+    """
+    # create references to handler functions
+    adv.player["commands"] = {command: eval(command) for command in adv.commands}
+    # notes for the transcript, off by default
+    adv.player["turn"] = {}
+    adv.player["transcript"] = None
+    # schedule timed events defined in the data files
+    adv.player["events"] = []
+    initial_events(adv)
+
+def pocket(adv):
+    """Location of the items the player carries.
+    It's the inventory pseudo-room, every player of the shared world has an own one, see world.py.
+
+    Args:
+        adv:    namedtuble holding the game data
+
+    Modifies:   nothing
+
+    Returns:
+        string: name of the player's inventory in rooms
+    """
+    return adv.player["pocket"]
+
+def stock(adv):
+    """Index the items in every room by their location.
+    Items must be moved with place() to keep the index up to date.
+
+    Args:
+        adv:    namedtuble holding the game data
+
+    Modifies:
+        adv:    rooms get a set of item names in "items"
+
+    Returns:    nothing
+    """
+    for room in adv.rooms.values():
+        room["items"] = set()
+    for name, item in adv.items.items():
+        adv.rooms[item["location"]]["items"].add(name)
+
+def place(adv, name, location):
+    """Move an item to a new location.
+
+    Args:
+        adv:        namedtuble holding the game data
+        name:       item's name
+        location:   where to put the item
+
+    Modifies:
+        adv:    item's location and the item index of the rooms, see stock()
+
+    Returns:    nothing
+    """
+    item = adv.items[name]
+    adv.rooms[item["location"]]["items"].discard(name)
+    item["location"] = location
+    adv.rooms[location]["items"].add(name)
+
 @show
 @linewrap
 def room_description(adv):
@@ -218,7 +311,7 @@ def room_description(adv):
     if "visible" in location["status"]:
         if "verbose" in adv.player["status"]:
             return location["long"]
-        if "short" in adv.player["status"] or "visited" in location["status"]:
+        if "short" in adv.player["status"] or adv.player["location"] in adv.player["visited"]:
             return adv.player["location"].capitalize() + "."
         return location["long"]
     return adv.messages["toodark"]
@@ -239,7 +332,7 @@ def items_listing(adv):
     location = adv.player["location"]
     if "visible" in adv.rooms[location]["status"]:
         items = get_items(adv, location, "visible", "portable", logic=all)
-        if location == "inventory":
+        if location == pocket(adv):
             msg = adv.messages["inventory"]
             definite = True
         else:
@@ -256,13 +349,20 @@ def player_input(adv):
 
     Modifies:
         adv:    player["command"] holds the input string
+                player["turn"] is reset for the handlers to note what happened
 
     Returns:
         string: although through execute() and react()
     """
     prompt = ">" if adv.player["step"] > CHANGE_PROMPT else adv.messages["prompt"]
     adv.player["command"] = input("{} ".format(prompt)).lower()
+    raw, location = adv.player["command"], adv.player["location"]
+    adv.player["turn"] = {}
+    start = time.perf_counter()
     execute(adv)
+    # waiting for the player's answer to a question isn't part of the latency, see leave()
+    latency = time.perf_counter() - start - adv.player["turn"].get("waiting", 0)
+    transcript(adv, raw, location, latency)
 
 def execute(adv):
     """Execute player's command.
@@ -301,11 +401,15 @@ def react(adv):
     # first, look up for a verb
     com = idword(adv.commands, command)
     if com:
+        note(adv, keyword=com, handler=com)
         return exe[com](adv)
     # second, look up for a movement direction, as this is the most common command
-    if idword(adv.direction, command):
+    drc = idword(adv.direction, command)
+    if drc:
+        note(adv, keyword=drc, handler="move")
         return exe["move"](adv)
     # at last, the parser doesn't understand
+    note(adv, outcome="???")
     return adv.messages["???"]
 
 def vocabulary(adv, element):
@@ -339,10 +443,174 @@ def get_items(adv, location, *status, logic):
     return [name for name, item in adv.items.items() if item["location"] == location and\
             check(item["status"], *status, logic=logic)]
 
+def make_index(adv):
+    """Build sorted word lists for tab completion, once at startup.
+    Words are grouped by what brings them in scope, so completing never has to look at words out
+    of scope, see in_scope(). Item words are grouped by item, the items in scope are found by their
+    current location, see stock().
+
+    Args:
+        adv:    namedtuble holding the game data
+
+    Modifies:   nothing
+
+    Returns:
+        dict:   commands:   sorted list of all verbs
+                exits:      room names with sorted lists of the words of their exits
+                rooms:      room names with sorted lists of their words
+                items:      item names with sorted lists of their words and markers
+                visited:    sorted list of the words of visited rooms, see remember()
+                seen:       set of rooms in visited
+                source:     player's set of visited rooms seen was taken from
+    """
+    return {"commands": sorted(word for words in adv.commands.values() for word in words),
+            "exits": {name: sorted(word for drc in room["exits"] if drc in adv.direction
+                                   for word in adv.direction[drc])
+                      for name, room in adv.rooms.items()},
+            "rooms": {name: sorted(room["words"]) for name, room in adv.rooms.items()},
+            "items": {name: sorted(item["words"] | item["marker"])
+                      for name, item in adv.items.items()},
+            "visited": [],
+            "seen": set(),
+            "source": None}
+
+def remember(adv, index):
+    """Keep the words of visited rooms in the completion index up to date.
+    Rooms only get added to the player's visited rooms, so an unchanged size means nothing to do,
+    and only the new ones get merged in. The list is rebuilt if the set was replaced, e.g. by
+    restoring a saved game.
+
+    Args:
+        adv:    namedtuble holding the game data
+        index:  completion index, see make_index()
+
+    Modifies:
+        index:  visited words and seen rooms
+
+    Returns:    nothing
+    """
+    visited = adv.player["visited"]
+    if visited is index["source"] and len(visited) == len(index["seen"]):
+        return
+    if visited is not index["source"]:
+        index["visited"].clear()
+        index["seen"].clear()
+        index["source"] = visited
+    for room in visited - index["seen"]:
+        for word in index["rooms"][room]:
+            bisect.insort(index["visited"], word)
+    index["seen"].update(visited)
+
+def in_scope(adv, index, prefix):
+    """Collect the words starting with prefix the player can refer to right now.
+    All the verbs, exits of the current location, visible items here and in the inventory, the
+    current location and the rooms visited so far. Every group is searched by bisection and gives
+    at most COMPLETION_LIMIT words.
+
+    Args:
+        adv:    namedtuble holding the game data
+        index:  completion index, see make_index()
+        prefix: string the words should start with
+
+    Modifies:
+        index:  through remember()
+
+    Returns:
+        list:   at most COMPLETION_LIMIT words, alphabetically
+    """
+    remember(adv, index)
+    location = adv.player["location"]
+    found = set()
+    for words in (index["commands"], index["exits"][location], index["rooms"][location],
+                  index["visited"]):
+        found.update(islice((words[idx] for idx in prefixed(words, prefix)), COMPLETION_LIMIT))
+    if "visible" in adv.rooms[location]["status"]:
+        for here in (location, pocket(adv)):
+            for name in adv.rooms[here]["items"]:
+                if check(adv.items[name]["status"], "visible", "portable", logic=all):
+                    words = index["items"][name]
+                    found.update(words[idx] for idx in prefixed(words, prefix))
+    return sorted(found)[:COMPLETION_LIMIT]
+
+def completer(adv, index):
+    """Make a readline completer function.
+
+    Args:
+        adv:    namedtuble holding the game data
+        index:  completion index, see make_index()
+
+    Modifies:   nothing
+
+    Returns:
+        function:   completer function
+    """
+    matches = []
+    def complete(text, state):
+        """Offer known words in scope starting with the typed text.
+        Readline calls this with increasing state until it returns None, matches are collected
+        on the first call only.
+
+        Args:
+            text:   string: the word being typed
+            state:  index of the requested match
+
+        Modifies:   nothing
+
+        Returns:
+            string: a matching word or
+            None:   if there are no more matches
+        """
+        if state == 0:
+            matches[:] = in_scope(adv, index, text.lower())
+        return matches[state] if state < len(matches) else None
+    return complete
+
+def note(adv, **fields):
+    """Note what happened in this turn for the transcript.
+
+    Args:
+        adv:        namedtuble holding the game data
+        **fields:   keyword, handler, item or outcome of the turn, or seconds spent waiting for
+                    the player
+
+    Modifies:
+        adv:    player["turn"] gets updated with fields
+
+    Returns:    nothing
+    """
+    adv.player["turn"].update(fields)
+
+def transcript(adv, raw, location, latency):
+    """Append a record of the turn to the transcript file, if there's any.
+    One json object per line, see analyze.py for mining them.
+
+    Args:
+        adv:        namedtuble holding the game data
+        raw:        string: player's input as typed
+        location:   where the player was when typing
+        latency:    seconds spent with executing the command
+
+    Modifies:   nothing
+
+    Returns:    nothing
+    """
+    if adv.player["transcript"]:
+        record = {"input": raw,
+                  "tokens": adv.player["command"],
+                  "keyword": adv.player["turn"].get("keyword"),
+                  "handler": adv.player["turn"].get("handler"),
+                  "item": adv.player["turn"].get("item"),
+                  "outcome": adv.player["turn"].get("outcome"),
+                  "location": location,
+                  "latency": round(latency, 6)}
+        adv.player["transcript"].write(json.dumps(record, ensure_ascii=False) + "\n")
+
 @show
 @linewrap
 def predefined_events(adv):
     """Handle predefined actions.
+    Events happen only where the player is, so the shared world has them in a locked room, see
+    world.py.
 
     Args:
         adv:    namedtuble holding the game data
@@ -351,15 +619,77 @@ def predefined_events(adv):
 
     Returns:    nothing
     """
-    # examining or taking the door mat reveals the small key
+    # examining or taking the door mat reveals the small key, when being at the key
     doormat = adv.items["lábtörlő"]
     smallkey = adv.items["kis kulcs"]
-    if ("examined" in doormat["status"] or doormat["location"] == "inventory")\
-       and "hidden" in smallkey["status"]:
+    if ("examined" in doormat["status"] or doormat["location"] == pocket(adv))\
+       and "hidden" in smallkey["status"] and adv.player["location"] == smallkey["location"]:
         smallkey["status"].add("visible")
         smallkey["status"].remove("hidden")
         return adv.messages["reveal"]
 
+@show
+@linewrap
+def timed_events(adv):
+    """Fire scheduled events which are due by now.
+    Pending events are kept in a heap ordered by due step, so only the due ones are popped and the
+    rest of them is never looked at. Recurring events get rescheduled after firing.
+
+    Args:
+        adv:    namedtuble holding the game data
+
+    Modifies:
+        adv:    player's pending events
+
+    Returns:
+        string: messages of the fired events or
+        None:   if nothing happened
+    """
+    events = adv.player["events"]
+    fired = []
+    while events and events[0][0] <= adv.player["step"]:
+        _, event, every = heapq.heappop(events)
+        if every:
+            schedule(adv, event, every, every)
+        # unknown event, e.g. scheduled by a handler or restored but not in events.json
+        message = adv.events.get(event, {}).get("message")
+        if message:
+            fired.append(adv.messages[message])
+    return " ".join(fired)
+
+def schedule(adv, event, delay, every=0):
+    """Schedule an event to happen after some steps.
+    Handlers may call this as well to make something happen later on.
+
+    Args:
+        adv:    namedtuble holding the game data
+        event:  string: keyword in events.json
+        delay:  number of steps from now
+        every:  repeat the event by this many steps, 0 means it happens only once
+
+    Modifies:
+        adv:    player's pending events
+
+    Returns:    nothing
+    """
+    heapq.heappush(adv.player["events"], (adv.player["step"] + delay, event, every))
+
+def initial_events(adv):
+    """Schedule the events of events.json which have a start step.
+    Start steps count from the current step.
+
+    Args:
+        adv:    namedtuble holding the game data
+
+    Modifies:
+        adv:    player's pending events
+
+    Returns:    nothing
+    """
+    for event, props in adv.events.items():
+        if "start" in props:
+            schedule(adv, event, props["start"], props.get("every", 0))
+
 
 ####################################################################################################
 # HELPER FUNCTIONS
@@ -497,6 +827,23 @@ def idword(vocabulary, command):
             return keyword
     return None
 
+def prefixed(words, prefix):
+    """Find the words starting with prefix in a sorted list by bisection.
+
+    Args:
+        words:  sorted list of strings
+        prefix: string the words should start with
+
+    Modifies:   nothing
+
+    Yields:
+        int:    index of a word starting with prefix, in order
+    """
+    for idx in range(bisect.bisect_left(words, prefix), len(words)):
+        if not words[idx].startswith(prefix):
+            return
+        yield idx
+
 ####################################################################################################
 # JSON DATA PERSISTENCE
 # Functions here relate to data persistence used by the game.
@@ -593,7 +940,10 @@ def leave(adv):
     Returns:
         string: 'bye' message if really leaving or 'ok' if playing forth
     """
-    if confirm(adv.messages["confirm"]):
+    start = time.perf_counter()
+    confirmed = confirm(adv.messages["confirm"])
+    note(adv, waiting=time.perf_counter() - start)
+    if confirmed:
         adv.player["status"].remove("playing")
         return adv.messages["bye"]
     return adv.messages["ok"]
@@ -622,8 +972,9 @@ def move(adv):
 def save(adv):
     """save game to .json file - provide filename ending .save
     Looks for provided filename ending .save, or default.save is used.
-    Will be saved:  player's status, location, steps
+    Will be saved:  player's status, location, steps, visited rooms
                     status of all rooms
+                    pending timed events
 
     Args:
         adv:    namedtuble holding the game data
@@ -635,8 +986,12 @@ def save(adv):
     """
     tosave = {"player": {"status": list(adv.player["status"]),
                          "location": adv.player["location"],
-                         "step": adv.player["step"]}}
+                         "step": adv.player["step"],
+                         "visited": list(adv.player["visited"])}}
     tosave.update({"rooms": {name: list(adv.rooms[name]["status"]) for name in adv.rooms}})
+    # lists would become sets on restoring, see list2set(), so events are saved in a dictionary
+    tosave.update({"events": {str(idx): {"step": due, "event": event, "every": every}
+                              for idx, (due, event, every) in enumerate(adv.player["events"])}})
     if dump(tosave, savefile(adv.player["command"]) + ".save"):
         return adv.messages["ok"]
     return adv.messages["!!!"]
@@ -651,6 +1006,7 @@ def restore(adv):
     Modifies:
         adv:    player's data
                 all room status data
+                pending timed events
     Returns:
         string: message if restoring was successful or a warning if it wasn't
     """
@@ -662,10 +1018,22 @@ def restore(adv):
         adv.player["status"].update(rst["player"]["status"])
         adv.player["location"] = rst["player"]["location"]
         adv.player["step"] = rst["player"]["step"]
+        # restore visited rooms, older saves kept them in the room's status
+        adv.player["visited"] = set(rst["player"].get("visited", {room for room, status in
+                                                                  rst["rooms"].items()
+                                                                  if "visited" in status}))
         # restore room's status
         for room, status in rst["rooms"].items():
             adv.rooms[room]["status"].clear()
-            adv.rooms[room]["status"].update(status)
+            adv.rooms[room]["status"].update(status - {"visited"})
+        # restore pending events, saves made before timed events get the ones of events.json
+        if "events" in rst:
+            adv.player["events"] = [(event["step"], event["event"], event["every"])
+                                    for event in rst["events"].values()]
+            heapq.heapify(adv.player["events"])
+        else:
+            adv.player["events"] = []
+            initial_events(adv)
         return adv.messages["ok"]
     return adv.messages["!!!"]
 
@@ -707,7 +1075,7 @@ def again(adv):
     return adv.messages["repeat"] + adv.player["command"]
 
 @increase_step
-@Relocate("inventory")
+@Relocate(pocket)
 def inventory(adv):
     """Show items in player's inventory.
      Uses the already available item_listing() through relocating the player into its inventory.
@@ -748,13 +1116,15 @@ def examine(adv):
         return inventory(adv)
     # check for an item
     available_items = get_items(adv, location, "visible", "portable", logic=all)
-    available_items += get_items(adv, "inventory", "visible", "portable", logic=all)
+    available_items += get_items(adv, pocket(adv), "visible", "portable", logic=all)
     item = idword(vocabulary(adv, "items"), command)
     if item in available_items:
+        note(adv, item=item)
         item = adv.items[item]
         if not item["marker"] or check(item["marker"], *command, logic=any):
             item["status"].add("examined")
             return item["long"]
+        note(adv, outcome="specify")
         return adv.messages["specify"]
     # check for current room name or indicating looking around or examine stands alone
     room = idword(vocabulary(adv, "rooms"), command)
@@ -762,6 +1132,7 @@ def examine(adv):
     if room == location or misc == "everything" or len(command) == 1:
         adv.rooms[location]["status"].add("examined")
         return adv.rooms[location]["long"]
+    note(adv, outcome="unknown")
     return adv.messages["unknown"]
 
 
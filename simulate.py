@@ -0,0 +1,288 @@
+"""
+The House in the Woods
+Playtest simulator
+
+Lets a crowd of wandering agents loose in the house to see how many steps a player typically needs
+to reach a room. The map is turned into a transition matrix built from every room's exits, and all
+the agents of a batch take their step at once with NumPy, so no Python-level loop over move() is
+needed.
+
+Run it in the game's directory:
+    python simulate.py [sivatag] [--agents 100000] [--steps 1000] [--strategy exits]
+Strategies:
+    random:     type any direction, even if there's no exit that way (costs a step anyway)
+    exits:      take a random exit of the current room
+    explore:    take a random exit to a room not visited yet, or any exit if there's none
+"""
+
+import argparse  # command line arguments
+from collections import deque  # breadth-first search
+
+import numpy as np  # vectorised agents
+
+import main as game  # game data and its loading
+
+
+####################################################################################################
+# CONSTANTS
+####################################################################################################
+
+AGENTS = 100000  # agents to let loose by default
+MAX_STEPS = 1000  # agents give up after this many steps
+BATCH = 10000  # agents simulated at once, bounds memory use of the 'explore' strategy
+PERCENTILES = (10, 25, 50, 75, 90, 99)  # of the step-count distribution
+STRATEGIES = ("random", "exits", "explore")
+PSEUDO_ROOMS = {"inventory"}  # not real places, see Relocate in main.py
+
+
+####################################################################################################
+# MAIN EXECUTING FUNCTION
+####################################################################################################
+
+def main():
+    """Main executing function.
+
+    Args:   none
+
+    Modifies:   nothing
+
+    Returns:    nothing
+    """
+    parser = argparse.ArgumentParser(description="Simulate wandering players.")
+    parser.add_argument("target", nargs="?", default="sivatag", help="room to reach")
+    parser.add_argument("--start", default=None, help="starting room, player's location by default")
+    parser.add_argument("--agents", type=int, default=AGENTS, help="number of agents")
+    parser.add_argument("--steps", type=int, default=MAX_STEPS, help="steps before giving up")
+    parser.add_argument("--strategy", choices=STRATEGIES, default="exits", help="agents' behaviour")
+    parser.add_argument("--seed", type=int, default=None, help="random seed")
+    args = parser.parse_args()
+
+    adv = game.setup(*game.get_jsons())
+    rooms, moves = graph(adv)
+    if args.agents < 1:
+        parser.error("--agents must be at least 1")
+    for room in (args.target, args.start):
+        if room is not None and room not in rooms:
+            parser.error("unknown room: {} (choose from {})".format(room, ", ".join(rooms)))
+    start = rooms.index(args.start or adv.player["location"])
+    target = rooms.index(args.target)
+    rng = np.random.default_rng(args.seed)
+
+    arrivals = []
+    visits = np.zeros(len(rooms), dtype=np.int64)
+    for agents in batches(args.agents):
+        arrival, visited = simulate(moves, start, target, agents, args.steps, args.strategy, rng)
+        arrivals.append(arrival)
+        visits += visited
+    arrival = np.concatenate(arrivals)
+
+    report(rooms, moves, arrival, visits, target, args)
+
+
+####################################################################################################
+# SIMULATION FUNCTIONS
+####################################################################################################
+
+def graph(adv):
+    """Build the transition matrix of the house.
+    Directions without exit lead back to the same room, like move() does.
+
+    Args:
+        adv:    namedtuple holding the game data
+
+    Modifies:   nothing
+
+    Returns:
+        list:       room names, the order of rows
+        ndarray:    destination room index of every room (rows) and direction (columns)
+    """
+    rooms = [name for name in adv.rooms if name not in PSEUDO_ROOMS]
+    index = {name: idx for idx, name in enumerate(rooms)}
+    directions = {drc: idx for idx, drc in enumerate(adv.direction)}
+    moves = np.repeat(np.arange(len(rooms))[:, None], len(directions), axis=1)
+    for name in rooms:
+        for drc, destination in adv.rooms[name]["exits"].items():
+            if drc in directions:  # the parser couldn't use any other
+                moves[index[name], directions[drc]] = index[destination]
+    return rooms, moves
+
+def adjacency(moves):
+    """Adjacency matrix of the rooms.
+
+    Args:
+        moves:  transition matrix, see graph()
+
+    Modifies:   nothing
+
+    Returns:
+        ndarray:    boolean, True where the row's room has an exit to the column's room
+    """
+    size = len(moves)
+    adjacent = np.zeros((size, size), dtype=bool)
+    adjacent[np.arange(size)[:, None], moves] = True
+    adjacent[np.arange(size), np.arange(size)] = False
+    return adjacent
+
+def reachable(moves, target):
+    """Which rooms the target can be reached from.
+    Breadth-first search from the target walking the exits backwards, so every exit is looked at
+    once at most.
+
+    Args:
+        moves:  transition matrix, see graph()
+        target: target room index
+
+    Modifies:   nothing
+
+    Returns:
+        ndarray:    boolean, True for rooms the target can be reached from
+    """
+    size = len(moves)
+    sources, columns = np.nonzero(moves != np.arange(size)[:, None])
+    destinations = moves[sources, columns]
+    order = np.argsort(destinations, kind="stable")
+    predecessors = sources[order].tolist()
+    bounds = np.searchsorted(destinations[order], np.arange(size + 1)).tolist()
+    reach = [False] * size
+    reach[target] = True
+    pending = deque([target])
+    while pending:
+        room = pending.popleft()
+        for previous in predecessors[bounds[room]:bounds[room + 1]]:
+            if not reach[previous]:
+                reach[previous] = True
+                pending.append(previous)
+    return np.array(reach)
+
+def exits(moves):
+    """Destinations of the real exits of every room, padded to the same width.
+    Rooms without any exit get themselves as the only destination.
+
+    Args:
+        moves:  transition matrix, see graph()
+
+    Modifies:   nothing
+
+    Returns:
+        ndarray:    destination room indices, -1 as padding
+    """
+    size = len(moves)
+    real = moves != np.arange(size)[:, None]
+    width = max(real.sum(axis=1).max(), 1)
+    padded = np.full((size, width), -1)
+    for room in range(size):
+        destinations = moves[room, real[room]]
+        padded[room, :max(len(destinations), 1)] = destinations if len(destinations) else room
+    return padded
+
+def simulate(moves, start, target, agents, steps, strategy, rng):
+    """Let a batch of agents wander until they reach the target or give up.
+
+    Args:
+        moves:      transition matrix, see graph()
+        start:      starting room index
+        target:     target room index
+        agents:     number of agents in the batch
+        steps:      steps before giving up
+        strategy:   one of STRATEGIES
+        rng:        numpy random generator
+
+    Modifies:   nothing
+
+    Returns:
+        ndarray:    step count of arrival of every agent, -1 if it gave up
+        ndarray:    visit count of every room
+    """
+    size = len(moves)
+    destinations = exits(moves)
+    position = np.full(agents, start)
+    arrival = np.full(agents, 0 if start == target else -1)
+    visits = np.zeros(size, dtype=np.int64)
+    visits[start] += agents
+    visited = np.zeros((agents, size), dtype=bool) if strategy == "explore" else None
+    if visited is not None:
+        visited[:, start] = True
+    active = np.flatnonzero(arrival < 0)
+    for step in range(1, steps + 1):
+        if not active.size:
+            break
+        here = position[active]
+        if strategy == "random":
+            there = moves[here, rng.integers(moves.shape[1], size=active.size)]
+        else:
+            options = destinations[here]
+            keys = rng.random(options.shape)
+            keys[options < 0] = -1.0
+            if visited is not None:  # unvisited rooms win over any visited one
+                keys += (options >= 0) & ~visited[active[:, None], options]
+            there = options[np.arange(active.size), keys.argmax(axis=1)]
+            if visited is not None:
+                visited[active, there] = True
+        position[active] = there
+        visits += np.bincount(there, minlength=size)
+        arrived = there == target
+        arrival[active[arrived]] = step
+        active = active[~arrived]
+    return arrival, visits
+
+
+####################################################################################################
+# HELPER FUNCTIONS
+####################################################################################################
+
+def batches(agents):
+    """Split agents to batches of at most BATCH.
+
+    Args:
+        agents: number of all agents
+
+    Modifies:   nothing
+
+    Yields:
+        int:    number of agents in the batch
+    """
+    for first in range(0, agents, BATCH):
+        yield min(BATCH, agents - first)
+
+def report(rooms, moves, arrival, visits, target, args):
+    """Print the results of the simulation.
+
+    Args:
+        rooms:      room names
+        moves:      transition matrix, see graph()
+        arrival:    step count of arrival of every agent, -1 if it gave up
+        visits:     visit count of every room
+        target:     target room index
+        args:       command line arguments
+
+    Modifies:   nothing
+
+    Returns:    nothing
+    """
+    reached = arrival[arrival >= 0]
+    print("{} agents ({}) heading to {}, giving up after {} steps".format(
+        len(arrival), args.strategy, rooms[target], args.steps))
+    print("reached: {:.2%}".format(len(reached) / len(arrival)))
+    if reached.size:
+        print("steps:   mean {:.1f}, min {}, max {}".format(reached.mean(), reached.min(),
+                                                            reached.max()))
+        for percentile, value in zip(PERCENTILES, np.percentile(reached, PERCENTILES)):
+            print("         {:>2}% within {:.0f}".format(percentile, value))
+
+    adjacent = adjacency(moves)
+    reach = reachable(moves, target)
+    share = visits / max(visits.sum(), 1)
+    print()
+    print("{:<16}{:>10}{:>8}  {}".format("room", "visits", "exits", "notes"))
+    for idx, name in enumerate(rooms):
+        notes = []
+        if adjacent[idx].sum() == 1:
+            notes.append("dead end")
+        if not reach[idx]:
+            notes.append("{} unreachable".format(rooms[target]))
+        print("{:<16}{:>10.2%}{:>8}  {}".format(name, share[idx], adjacent[idx].sum(),
+                                                ", ".join(notes)))
+
+
+if __name__ == "__main__":
+    main()
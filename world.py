@@ -0,0 +1,480 @@
+"""
+The House in the Woods
+Shared world server
+
+Several players in the same house at the same time. Rooms and items are shared by everyone, while
+every player has its own state (location, status, steps, visited rooms, timed events) and its own
+inventory. Each player gets its own view of the game data, a copy of the adventure namedtuple
+sharing everything but the player, so the handlers of main.py work unchanged. A player's inventory
+is a pseudo-room of its own, named after the player, so an item carried by one player is out of
+reach for everyone else.
+
+Every player is served by its own thread. A turn locks the player's room only, so players in
+different rooms don't wait for each other. A move releases the room it leaves and then takes the
+lock of the room entered, so no turn ever holds two room locks and there's no lock order to keep.
+Handlers only touch the player's room and the player's own state. Output goes through a queue
+drained by a writer thread of every player, so a slow client never holds a room locked. Players in
+the same room are told about each other's actions.
+
+Run it in the game's directory, then connect with e.g. telnet:
+    python world.py [--host localhost] [--port 4000]
+"""
+
+import argparse  # command line arguments
+import copy  # every player gets its own copy of the player template
+import queue  # output of players
+import socketserver  # serving players over tcp
+import sys  # routing standard output to players
+import threading  # room locks, thread-local output
+from collections import ChainMap  # private inventory items over the shared ones
+
+import main as game  # game data and handlers
+
+
+####################################################################################################
+# CONSTANTS
+####################################################################################################
+
+HOST = "localhost"
+PORT = 4000
+PRIVATE = "inventory"  # items here at start are copied to every player's own inventory
+POCKET = PRIVATE + ":{}"  # location of a player's own inventory, see pocket() in main.py
+SHARED_ONLY = ("save", "restore")  # would overwrite the shared world
+
+
+####################################################################################################
+# CLASSES
+####################################################################################################
+
+class Output:
+    """Standard output routing to the player served by the current thread.
+    Installed as sys.stdout, so print() in the show decorator reaches the right player.
+    """
+    def __init__(self, default):
+        """Class initializer.
+
+        Args:
+            default:    stream to write to outside of player threads
+        """
+        self._default = default
+        self._local = threading.local()
+
+    def bind(self, outbox):
+        """Route the current thread's output to a player.
+
+        Args:
+            outbox: queue of the player's output, None to unbind
+
+        Modifies:   nothing
+
+        Returns:    nothing
+        """
+        self._local.outbox = outbox
+
+    def write(self, text):
+        """Write text to the current thread's player or the default stream.
+
+        Args:
+            text:   string to write
+
+        Modifies:   nothing
+
+        Returns:
+            int:    length of text
+        """
+        outbox = getattr(self._local, "outbox", None)
+        if outbox is None:
+            return self._default.write(text)
+        outbox.put(text)
+        return len(text)
+
+    def flush(self):
+        """Flush the default stream, player output gets flushed by the writer thread.
+
+        Args:   none
+
+        Modifies:   nothing
+
+        Returns:    nothing
+        """
+        if getattr(self._local, "outbox", None) is None:
+            self._default.flush()
+
+
+class World:
+    """Game data shared by all the players in the house.
+    """
+    def __init__(self):
+        """Class initializer, load the game data once.
+        """
+        self.adv = game.setup(*game.get_jsons())
+        if not all(self.adv):
+            sys.exit("Something went wrong, unable to start the game.")
+        self._player = copy.deepcopy(self.adv.player)
+        self._private = {name: item for name, item in self.adv.items.items()
+                         if item["location"] == PRIVATE}
+        for name in self._private:
+            del self.adv.items[name]
+        game.stock(self.adv)
+        self._locks = {room: threading.Lock() for room in self.adv.rooms}
+        self._guard = threading.Lock()  # names
+        self._names = set()  # names of players in the house
+        self.occupants = {room: {} for room in self.adv.rooms}  # room: {name: outbox}
+
+    def join(self, name, outbox):
+        """A new player enters the house.
+
+        Args:
+            name:   string: player's name, must be unique
+            outbox: queue of the player's output
+
+        Modifies:
+            occupants:  player is added to the starting room
+            names:      player's name is taken
+
+        Returns:
+            namedtuple: player's view of the game data or
+            None:       if the name is already taken
+        """
+        player = copy.deepcopy(self._player)
+        player["name"] = name
+        player["pocket"] = POCKET.format(name)
+        private = copy.deepcopy(self._private)
+        for item in private.values():
+            item["location"] = player["pocket"]
+        inventory = copy.deepcopy(self.adv.rooms[PRIVATE])
+        inventory["items"] = set(private)
+        rooms = ChainMap({player["pocket"]: inventory}, self.adv.rooms)
+        items = ChainMap(private, self.adv.items)
+        view = self.adv._replace(player=player, rooms=rooms, items=items)
+        game.prepare(view)
+        exe = view.player["commands"]
+        exe["leave"] = depart
+        exe.update({command: shared for command in SHARED_ONLY})
+        with self._guard:
+            if name in self._names:
+                return None
+            self._names.add(name)
+        with self.locked(view):
+            self.occupants[player["location"]][name] = outbox
+            self.broadcast(view, view.messages["arrives"].format(name))
+        return view
+
+    def part(self, view):
+        """A player leaves the house.
+
+        Args:
+            view:   player's view of the game data
+
+        Modifies:
+            occupants:  player is removed
+            names:      player's name is freed
+            items:      shared items carried by the player are dropped
+
+        Returns:    nothing
+        """
+        name = view.player["name"]
+        with self.locked(view):
+            for item in list(view.rooms[view.player["pocket"]]["items"]):
+                if item in self.adv.items:
+                    game.place(view, item, view.player["location"])
+            del self.occupants[view.player["location"]][name]
+            self.broadcast(view, view.messages["departs"].format(name))
+        with self._guard:
+            self._names.discard(name)
+
+    def locked(self, view):
+        """Lock of the player's room.
+
+        Args:
+            view:   player's view of the game data
+
+        Modifies:   nothing
+
+        Returns:
+            Lock:   to be used as context manager
+        """
+        return self._locks[view.player["location"]]
+
+    def broadcast(self, view, message):
+        """Tell everyone else in the player's room about something.
+        The room must be locked.
+
+        Args:
+            view:       player's view of the game data
+            message:    string to tell
+
+        Modifies:   nothing
+
+        Returns:    nothing
+        """
+        for name, outbox in self.occupants[view.player["location"]].items():
+            if name != view.player["name"]:
+                outbox.put(message + "\n")
+
+    def others(self, view):
+        """Other players in the same room.
+        The room must be locked.
+
+        Args:
+            view:   player's view of the game data
+
+        Modifies:   nothing
+
+        Returns:
+            string: message listing them or empty
+        """
+        names = [name for name in self.occupants[view.player["location"]]
+                 if name != view.player["name"]]
+        return view.messages["others"].format(", ".join(names)) if names else ""
+
+    def turn(self, view, line):
+        """Execute a player's command in the shared world.
+
+        Args:
+            view:   player's view of the game data
+            line:   string: player's input
+
+        Modifies:
+            view:       through the handlers
+            occupants:  when the player moves
+
+        Returns:    nothing
+        """
+        name = view.player["name"]
+        with self.locked(view):
+            before = view.player["location"]
+            view.player["command"] = line.lower()
+            view.player["turn"] = {}
+            game.execute(view)
+            if view.player["location"] == before:
+                game.predefined_events(view)
+                game.timed_events(view)
+                if view.player["turn"].get("handler"):
+                    self.broadcast(view, view.messages["acts"].format(name, line))
+                return
+            # moved: leave the room while it's still locked
+            outbox = self.occupants[before].pop(name)
+            after = view.player["location"]
+            view.player["location"] = before
+            self.broadcast(view, view.messages["departs"].format(name))
+            view.player["location"] = after
+        with self.locked(view):
+            self.occupants[after][name] = outbox
+            self.broadcast(view, view.messages["arrives"].format(name))
+            game.predefined_events(view)
+            game.timed_events(view)
+
+    def look(self, view):
+        """Show the player's surroundings.
+
+        Args:
+            view:   player's view of the game data
+
+        Modifies:
+            view:   current room is visited
+
+        Returns:    nothing
+        """
+        with self.locked(view):
+            game.room_description(view)
+            game.items_listing(view)
+            others = self.others(view)
+            if others:
+                print(others)
+            view.player["visited"].add(view.player["location"])
+
+
+class Session(socketserver.StreamRequestHandler):
+    """Serving a player connected over tcp.
+    """
+    disable_nagle_algorithm = True  # small writes mustn't wait for the client's delayed ack
+
+    def handle(self):
+        """Play the game with the connected player.
+
+        Args:   none
+
+        Modifies:
+            world:  through the turns
+
+        Returns:    nothing
+        """
+        world = self.server.world
+        outbox = queue.Queue()
+        writer = threading.Thread(target=self.deliver, args=(outbox,), daemon=True)
+        writer.start()
+        sys.stdout.bind(outbox)
+        view = None
+        try:
+            view = self.enter(world, outbox)
+            last = ""
+            while view and game.check(view.player["status"], "playing", "alive", "nowinner",
+                                      logic=all):
+                world.look(view)
+                prompt = view.messages["prompt"]
+                if view.player["step"] > game.CHANGE_PROMPT:
+                    prompt = ">"
+                line = self.ask(prompt)
+                if line is None:
+                    break
+                # there's no readline history to dig in, see again() in main.py
+                if game.check(view.commands["again"], *game.RE_EXPLET.split(line.lower()),
+                              logic=any):
+                    print(view.messages["repeat"] + last)
+                    line = last
+                last = line
+                world.turn(view, line)
+        finally:
+            if view:
+                world.part(view)
+            sys.stdout.bind(None)
+            outbox.put(None)
+            writer.join()
+
+    def enter(self, world, outbox):
+        """Ask for the player's name until it's a free one.
+
+        Args:
+            world:  shared world
+            outbox: queue of the player's output
+
+        Modifies:
+            world:  player joins
+
+        Returns:
+            namedtuple: player's view of the game data or
+            None:       if the player disconnected
+        """
+        while True:
+            name = self.ask(world.adv.messages["name"])
+            if name is None:
+                return None
+            if not name:
+                continue
+            view = world.join(name.capitalize(), outbox)
+            if view:
+                return view
+            print(world.adv.messages["taken"])
+
+    def ask(self, prompt):
+        """Prompt the player and read a line.
+
+        Args:
+            prompt: string to show
+
+        Modifies:   nothing
+
+        Returns:
+            string: player's input or
+            None:   if the player disconnected
+        """
+        sys.stdout.write(prompt + " ")
+        line = self.rfile.readline()
+        if not line:
+            return None
+        return line.decode("utf-8", errors="replace").strip()
+
+    def deliver(self, outbox):
+        """Writer thread draining the player's output to the socket.
+        Everything queued so far is sent in one write.
+
+        Args:
+            outbox: queue of the player's output, None ends delivering
+
+        Modifies:   nothing
+
+        Returns:    nothing
+        """
+        while True:
+            texts = [outbox.get()]
+            while texts[-1] is not None and not outbox.empty():
+                texts.append(outbox.get())
+            done = texts[-1] is None
+            if done:
+                texts.pop()
+            try:
+                self.wfile.write("".join(texts).encode("utf-8"))
+                self.wfile.flush()
+            except OSError:
+                pass  # disconnected, the reading side will notice
+            if done:
+                return
+
+
+class Server(socketserver.ThreadingTCPServer):
+    """Tcp server of a shared world.
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, world):
+        """Class initializer.
+
+        Args:
+            address:    tuple of host and port
+            world:      shared world to serve
+        """
+        super().__init__(address, Session)
+        self.world = world
+
+
+####################################################################################################
+# MAIN EXECUTING FUNCTION
+####################################################################################################
+
+def main():
+    """Main executing function.
+
+    Args:   none
+
+    Modifies:   nothing
+
+    Returns:    nothing
+    """
+    parser = argparse.ArgumentParser(description="Serve a shared world.")
+    parser.add_argument("--host", default=HOST, help="address to listen on")
+    parser.add_argument("--port", type=int, default=PORT, help="port to listen on")
+    args = parser.parse_args()
+
+    sys.stdout = Output(sys.stdout)
+    with Server((args.host, args.port), World()) as server:
+        server.serve_forever()
+
+
+####################################################################################################
+# HANDLER FUNCTIONS
+# Replacing the handlers of main.py which don't fit a shared world.
+####################################################################################################
+
+def depart(adv):
+    """Player leaves the house, without asking for confirmation.
+
+    Args:
+        adv:    player's view of the game data
+
+    Modifies:
+        adv:    player's status by removing 'playing'
+
+    Returns:
+        string: 'bye' message
+    """
+    adv.player["status"].remove("playing")
+    return adv.messages["bye"]
+
+def shared(adv):
+    """Saving and restoring would overwrite the shared world.
+
+    Args:
+        adv:    player's view of the game data
+
+    Modifies:   nothing
+
+    Returns:
+        string: warning message
+    """
+    return adv.messages["shared"]
+
+
+if __name__ == "__main__":
+    main()